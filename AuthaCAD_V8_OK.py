@@ -1,228 +1,315 @@
-import math
+import numpy as np
 import pyautocad
 import logging
 import re
-from pyautocad.cache import Cached
+from collections import namedtuple
+from functools import lru_cache
 from jinja2 import Template
 from num2words import num2words
+from scipy.spatial import cKDTree
+from _geom_numba import is_convex_polygon, compute_all
 
-def are_floats_equal(f1, f2, tolerance=1e-9):
-    return abs(f1 - f2) < tolerance
+try:
+    import win32com.client
+except ImportError:
+    win32com = None
 
-def is_point_close(point1, point2, tolerance=1e-6):
-    return math.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2) < tolerance
+_CLEAN_RE = re.compile(r'\\P|\\pxqc;')
+_LOT_QUAD_RE = re.compile(r'Lote nº (\d+)|Quadra (\w+)')
+
+# Interfaces in the AutoCAD type library that expose each entity's own properties
+_EARLY_BOUND_INTERFACES = {'AcDbPolyline': 'IAcadLWPolyline', 'AcDbText': 'IAcadText', 'AcDbMText': 'IAcadMText'}
+
+# Plain in-memory copy of the COM attributes we need, so nothing downstream talks to AutoCAD
+Snapshot = namedtuple("Snapshot", "kind handle coords easting northing elevation number insertion text area length raw_entity", defaults=(None,) * 12)
+
+def connect_document():
+    """Return the active AutoCAD document, early-bound through win32com when its type library is registered."""
+    if win32com is not None:
+        try:
+            return win32com.client.gencache.EnsureDispatch("AutoCAD.Application").ActiveDocument
+        except Exception as e:
+            logging.warning(f"Early-bound AutoCAD unavailable, falling back to pyautocad: {e}")
+    return pyautocad.Autocad(create_if_not_exists=True).ActiveDocument
+
+def bind_entity(entity, entity_name):
+    """Return entity behind the interface that exposes its properties."""
+    # Early-bound selection sets yield generic IAcadEntity proxies; pyautocad (comtypes) entities are already late-bound
+    oleobj = getattr(entity, '_oleobj_', None)
+    if win32com is None or oleobj is None:
+        return entity
+    interface = _EARLY_BOUND_INTERFACES.get(entity_name)
+    if interface is not None:
+        try:
+            return win32com.client.CastTo(entity, interface)
+        except Exception:
+            pass
+    # Civil 3D types such as AeccDbCogoPoint are not in the AutoCAD type library
+    return win32com.client.dynamic.Dispatch(oleobj)
 
 def extract_coordinates(entity):
+    # Each attribute is read exactly once into the snapshot, so a Cached wrapper would never get a hit
     try:
-        cached_entity = Cached(entity)
-        if cached_entity.EntityName == 'AcDbPolyline':
-            coords = [round(coord, 3) for coord in cached_entity.Coordinates]
-            vertices_groups = [(coords[i], coords[i+1]) for i in range(0, len(coords), 2)]
-            return {'Type': 'Polyline', 'Coordinates': vertices_groups}
-        elif cached_entity.EntityName == 'AeccDbCogoPoint':
-            properties = ['Easting', 'Northing', 'Elevation', 'RawDescription', 'Number']
-            extracted_properties = {prop: round(float(getattr(cached_entity, prop)), 3) if isinstance(getattr(cached_entity, prop), float) else getattr(cached_entity, prop) for prop in properties}
-            return {'Type': 'CogoPoint', **extracted_properties}
-        elif cached_entity.EntityName == 'AcDbText' or cached_entity.EntityName == 'AcDbMText':
-            properties = ['InsertionPoint', 'TextString']
-            extracted_properties = {prop: getattr(cached_entity, prop) for prop in properties}
-            extracted_properties['InsertionPoint'] = tuple(round(coord, 3) for coord in extracted_properties['InsertionPoint'][:2])
-            return {'Type': 'Text', **extracted_properties}
+        entity_name = entity.EntityName
+        if entity_name in ('AcDbPolyline', 'AeccDbCogoPoint', 'AcDbText', 'AcDbMText'):
+            entity = bind_entity(entity, entity_name)
+        if entity_name == 'AcDbPolyline':
+            coords = np.asarray(entity.Coordinates, dtype=np.float64).reshape(-1, 2).round(3)
+            return Snapshot(kind='Polyline', handle=entity.Handle, coords=coords,
+                            area=entity.Area, length=entity.Length, raw_entity=entity)
+        elif entity_name == 'AeccDbCogoPoint':
+            return Snapshot(kind='CogoPoint', easting=entity.Easting, northing=entity.Northing,
+                            elevation=entity.Elevation, number=entity.Number, raw_entity=entity)
+        elif entity_name == 'AcDbText' or entity_name == 'AcDbMText':
+            return Snapshot(kind='Text', insertion=tuple(entity.InsertionPoint[:2]), text=entity.TextString, raw_entity=entity)
         else:
-            logging.warning(f"Unsupported entity type: {cached_entity.EntityName} for entity: {cached_entity}")
+            logging.warning(f"Unsupported entity type: {entity_name} for entity: {entity}")
             return None
     except Exception as e:
-        logging.error(f"Error extracting coordinates: {e} for entity: {cached_entity}")
+        logging.error(f"Error extracting coordinates: {e} for entity: {entity}")
         raise e
 
-def is_point_in_polygon(point, polygon):
-    x, y = point
-    polygon = list(zip(polygon[::2], polygon[1::2]))  # Create pairs of coordinates
-    n = len(polygon)
-    inside = False
-
-    p1x, p1y = polygon[0]
-    for i in range(n + 1):
-        p2x, p2y = polygon[i % n]
-        if y > min(p1y, p2y):
-            if y <= max(p1y, p2y):
-                if x <= max(p1x, p2x):
-                    if p1y != p2y:
-                        xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                    if p1x == p2x or x <= xinters:
-                        inside = not inside
-        p1x, p1y = p2x, p2y
-
-    return inside
-
-def get_center(vertices):
-    x_coords = [vertices[i] for i in range(0, len(vertices), 2)]
-    y_coords = [vertices[i] for i in range(1, len(vertices), 2)]
-    return sum(x_coords) / len(x_coords), sum(y_coords) / len(y_coords)
-
-def calculate_distance(point1, point2):
-    return math.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
-
-def get_text_inside_polyline(entity, selection_set):
-    if entity.EntityName != 'AcDbPolyline':
-        return None, None
-
-    vertices = entity.Coordinates
-    center = get_center(vertices)
-
-    inner_texts = []
-    min_distance = float('inf')
-    nearest_text = ""
-    nearest_text_unclean = ""
-
-    for inner_entity in selection_set:
-        if inner_entity.EntityName in ['AcDbText', 'AcDbMText']:
-            text_coords = inner_entity.InsertionPoint[:2]
-            if is_point_in_polygon(text_coords, vertices):
-                text_distance = calculate_distance(center, text_coords)
-                inner_texts.append((text_distance, re.sub(r'\\P', '', inner_entity.TextString)))
-                if text_distance < min_distance:
-                    min_distance = text_distance
-                    nearest_text = re.sub(r'\\P', '', inner_entity.TextString)
-                    nearest_text_unclean = inner_entity.TextString
-
-    return (re.sub(r'\\pxqc;', '', nearest_text) if nearest_text else "No text found", nearest_text_unclean)
-
-def get_all_entity_names(selection_set):
-    """Return a set of all entity names in the selection set."""
-    entity_names = set()
+def snapshot_selection_set(selection_set):
+    """Read every supported entity of the selection set over COM exactly once."""
+    snapshots = []
     for entity in selection_set:
-        try:
-            entity_names.add(entity.EntityName)
-        except AttributeError as e:
-            print(f"Entity of type {type(entity)} does not have an attribute 'EntityName'.")
-            raise e
-    return entity_names
-
-def get_vertex_name(entity, selection_set, vertex, tolerance=1e-6):
-    all_entity_names = get_all_entity_names(selection_set)
-    cogopoint_names = {name for name in all_entity_names if 'cogopoint' in name.lower()}
-
-    for inner_entity in selection_set:
-        if inner_entity.EntityName in cogopoint_names:
-            cogo_point_coords = (inner_entity.Easting, inner_entity.Northing)
-            if is_point_close(cogo_point_coords, vertex, tolerance):
-                point_number = inner_entity.Number
-                point_elevation = inner_entity.Elevation
-                return f"V{point_number}", point_elevation
-    print(f"No matching CogoPoint found for vertex: {vertex}")
-    return "Vertex not found", None
-
-acad = pyautocad.Autocad(create_if_not_exists=True)
-acad.prompt("Select entities\n")
+        snapshot = extract_coordinates(entity)
+        if snapshot is not None:
+            snapshots.append(snapshot)
+    return snapshots
+
+def get_text_label(texts, text_id):
+    """Return the cleaned and raw text for a compute_all nearest-text id, -1 meaning none inside."""
+    if text_id < 0:
+        return "No text found", ""
+    return (texts['Clean'][text_id] or "No text found", texts['Raw'][text_id])
+
+def quantize_points(vertices):
+    """Return integer millimetre keys, matching the 1e-3 vertex tolerance, for every row of a (V, 2) vertex array."""
+    return [tuple(key) for key in np.rint(vertices * 1000).astype(np.int64).tolist()]
+
+def build_cogopoint_index(snapshots):
+    """Return a KD-tree over the CogoPoint (Easting, Northing) pairs and their (Number, Elevation)."""
+    cogopoints = [snapshot for snapshot in snapshots if snapshot.kind == 'CogoPoint']
+    cogo_xy = np.asarray([(snapshot.easting, snapshot.northing) for snapshot in cogopoints], dtype=np.float64).reshape(-1, 2)
+    return {
+        'Tree': cKDTree(cogo_xy),
+        'Meta': [(snapshot.number, snapshot.elevation) for snapshot in cogopoints],
+    }
+
+def build_polyline_index(snapshots):
+    """Return a list of dicts with the snapshot, float64 X/Y arrays, convexity and bounding box of every polyline."""
+    polylines = []
+    for snapshot in snapshots:
+        if snapshot.kind == 'Polyline':
+            px = np.ascontiguousarray(snapshot.coords[:, 0])
+            py = np.ascontiguousarray(snapshot.coords[:, 1])
+            (xmin, ymin), (xmax, ymax) = snapshot.coords.min(axis=0), snapshot.coords.max(axis=0)
+            polylines.append({
+                'Snapshot': snapshot,
+                'X': px,
+                'Y': py,
+                'Convex': is_convex_polygon(px, py),
+                'BBox': (xmin, ymin, xmax, ymax),
+            })
+    return polylines
+
+def build_edge_map(polylines):
+    """Return a dict mapping each quantized polyline edge to the polylines that own it."""
+    edge_map = {}
+    for polyline in polylines:
+        vertex_keys = quantize_points(polyline['Snapshot'].coords)
+        for i in range(len(vertex_keys)):
+            edge_key = frozenset({vertex_keys[i], vertex_keys[(i+1) % len(vertex_keys)]})
+            edge_map.setdefault(edge_key, []).append(polyline)
+    return edge_map
+
+def is_point_in_bbox(point, bbox, tolerance=1e-9):
+    xmin, ymin, xmax, ymax = bbox
+    return xmin - tolerance <= point[0] <= xmax + tolerance and ymin - tolerance <= point[1] <= ymax + tolerance
+
+def find_adjacent_polyline(edge_map, polylines, handle, edge_key, current_vertex, next_vertex, tolerance=1e-9):
+    for other_polyline in edge_map.get(edge_key, ()):
+        if other_polyline['Snapshot'].handle != handle:
+            return other_polyline
+
+    # The neighbour may split this edge with extra vertices, so scan for both endpoints,
+    # rejecting most polylines on their bounding box before touching their vertices
+    for other_polyline in polylines:
+        if other_polyline['Snapshot'].handle == handle:
+            continue
+        if not (is_point_in_bbox(current_vertex, other_polyline['BBox'], tolerance) and is_point_in_bbox(next_vertex, other_polyline['BBox'], tolerance)):
+            continue
+        other_vertices = other_polyline['Snapshot'].coords
+        if np.any(np.all(np.abs(other_vertices - current_vertex) < tolerance, axis=1)) and \
+           np.any(np.all(np.abs(other_vertices - next_vertex) < tolerance, axis=1)):
+            return other_polyline
+    return None
+
+def build_text_index(snapshots):
+    """Return the text snapshots as parallel X/Y float64 arrays and cleaned/raw string lists."""
+    text_snapshots = [snapshot for snapshot in snapshots if snapshot.kind == 'Text']
+    return {
+        'X': np.array([snapshot.insertion[0] for snapshot in text_snapshots], dtype=np.float64),
+        'Y': np.array([snapshot.insertion[1] for snapshot in text_snapshots], dtype=np.float64),
+        'Clean': [_CLEAN_RE.sub('', snapshot.text) for snapshot in text_snapshots],
+        'Raw': [snapshot.text for snapshot in text_snapshots],
+    }
+
+def get_vertex_names(cogopoint_index, vertices, tolerance=1e-3):
+    """Return (name, elevation) of the CogoPoint on every row of a (V, 2) vertex array."""
+    distances, indices = cogopoint_index['Tree'].query(vertices, distance_upper_bound=tolerance)
+    vertex_names = []
+    for distance, index in zip(distances, indices):
+        if distance < tolerance:
+            point_number, point_elevation = cogopoint_index['Meta'][index]
+            vertex_names.append((f"V{point_number}", point_elevation))
+        else:
+            vertex_names.append(("Vertex not found", None))
+    return vertex_names
+
+def get_vertex_name(vertex_names, vertices, index):
+    vertex_name, vertex_elevation = vertex_names[index]
+    if vertex_name == "Vertex not found":
+        print(f"No matching CogoPoint found for vertex: {tuple(vertices[index].tolist())}")
+    return vertex_name, vertex_elevation
+
+def process_polylines(polylines, texts, cogopoint_index):
+    """Run the COM-free geometry for all polylines in one parallel batch and attach the results to each entry."""
+    poly_offsets = np.zeros(len(polylines) + 1, dtype=np.int64)
+    poly_offsets[1:] = np.cumsum([len(polyline['X']) for polyline in polylines])
+    poly_x = np.concatenate([polyline['X'] for polyline in polylines] or [np.empty(0)])
+    poly_y = np.concatenate([polyline['Y'] for polyline in polylines] or [np.empty(0)])
+    poly_convex = np.array([polyline['Convex'] for polyline in polylines], dtype=np.bool_)
+
+    distances, azimuths, nearest_text = compute_all(poly_offsets, poly_x, poly_y, poly_convex, texts['X'], texts['Y'])
+    vertex_names = get_vertex_names(cogopoint_index, np.column_stack((poly_x, poly_y)))
+
+    for p, polyline in enumerate(polylines):
+        start, end = poly_offsets[p], poly_offsets[p + 1]
+        polyline['Distances'] = distances[start:end]
+        polyline['Azimuths'] = azimuths[start:end]
+        polyline['VertexNames'] = vertex_names[start:end]
+        polyline['Text'] = get_text_label(texts, nearest_text[p])
+
+doc = connect_document()
+print("Select entities")
+doc.Utility.Prompt("Select entities\n")
 
 selectionSetName = 'SS1'
 selection_set = None
-for i in range(acad.ActiveDocument.SelectionSets.Count):
-    if acad.ActiveDocument.SelectionSets.Item(i).Name == selectionSetName:
-        selection_set = acad.ActiveDocument.SelectionSets.Item(i)
+for i in range(doc.SelectionSets.Count):
+    if doc.SelectionSets.Item(i).Name == selectionSetName:
+        selection_set = doc.SelectionSets.Item(i)
         break
 
 if selection_set is None:
-    selection_set = acad.ActiveDocument.SelectionSets.Add(selectionSetName)
+    selection_set = doc.SelectionSets.Add(selectionSetName)
 else:
     selection_set.Clear()
 
 selection_set.SelectOnScreen()
 
-template_initial = Template("Inicia-se a descrição deste perímetro no vértice {{ current_vertex_name }}, georreferenciado no Sistema Geodésico Brasileiro, DATUM - SIRGAS2000, MC-51°W, de coordenadas N {{ current_vertex[1] }}m e E {{ current_vertex[0] }}m de altitude {{ current_vertex_elevation }}m; deste segue confrontando com {{ adjacent_text }}, com azimute de {{ degrees }}°{{ minutes }}'{{ seconds }}\" por uma distância de {{ distance }}m até o vértice {{ next_vertex_name }}, de coordenadas N {{ next_vertex[1] }}m e E {{ next_vertex[0] }}m de altitude {{ next_vertex_elevation }}m;")
-template_other = Template("Deste segue confrontando com {{ adjacent_text }}, com azimute de {{ degrees }}°{{ minutes }}'{{ seconds }}\" por uma distância de {{ distance }}m até o vértice {{ next_vertex_name }}, de coordenadas N {{ next_vertex[1] }}m e E {{ next_vertex[0] }}m de altitude {{ next_vertex_elevation }}m;")
-template_final = Template("Todas as coordenadas aqui descritas estão georreferenciadas ao Sistema Geodésico Brasileiro e encontram-se representadas no Sistema UTM, referenciadas ao Meridiano Central nº 51 WGr, tendo como Datum o SIRGAS2000. Todos os azimutes e distâncias, área e perímetro foram calculados no plano de projeção UTM.")
+_fmt_initial = "Inicia-se a descrição deste perímetro no vértice {current_vertex_name}, georreferenciado no Sistema Geodésico Brasileiro, DATUM - SIRGAS2000, MC-51°W, de coordenadas N {current_vertex[1]}m e E {current_vertex[0]}m de altitude {current_vertex_elevation}m; deste segue confrontando com {adjacent_text}, com azimute de {degrees}°{minutes}'{seconds}\" por uma distância de {distance}m até o vértice {next_vertex_name}, de coordenadas N {next_vertex[1]}m e E {next_vertex[0]}m de altitude {next_vertex_elevation}m;".format
+_fmt_other = "Deste segue confrontando com {adjacent_text}, com azimute de {degrees}°{minutes}'{seconds}\" por uma distância de {distance}m até o vértice {next_vertex_name}, de coordenadas N {next_vertex[1]}m e E {next_vertex[0]}m de altitude {next_vertex_elevation}m;".format
+_FINAL_TEXT = "Todas as coordenadas aqui descritas estão georreferenciadas ao Sistema Geodésico Brasileiro e encontram-se representadas no Sistema UTM, referenciadas ao Meridiano Central nº 51 WGr, tendo como Datum o SIRGAS2000. Todos os azimutes e distâncias, área e perímetro foram calculados no plano de projeção UTM."
 template_header = Template("{{ lot_number }} da QUADRA “XX”, com área de {{ area }}m² ({{ area_text }}), com a seguinte descrição:")
-template_table = Template("Lado {{ current_vertex_name }}->{{ next_vertex_name }}: {{ current_vertex_name }}({{ current_vertex[0] }}, {{ current_vertex[1] }}, {{ current_vertex_elevation }}) -> {{ next_vertex_name }}({{ next_vertex[0] }}, {{ next_vertex[1] }}, {{ next_vertex_elevation }}), Distância: {{ distance }} m, Azimute: {{ degrees }}°{{ minutes }}'{{ seconds }}\"; ")
+_fmt_table = "Lado {current_vertex_name}->{next_vertex_name}: {current_vertex_name}({current_vertex[0]}, {current_vertex[1]}, {current_vertex_elevation}) -> {next_vertex_name}({next_vertex[0]}, {next_vertex[1]}, {next_vertex_elevation}), Distância: {distance} m, Azimute: {degrees}°{minutes}'{seconds}\"; ".format
  
-def generate_text_from_polyline(entity, selection_set, text_inside, text_inside_unclean):
-    entity_info = extract_coordinates(entity)
-    if entity_info is None or entity_info['Type'] != 'Polyline':
-        return None
-
-    vertices = entity_info['Coordinates']
-    area = round(entity.Area, 2)  # convert to m²
-    perimeter = round(entity.Length, 2)  # convert to m
-
-    lot_number = re.search(r'Lote nº (\d+)', text_inside_unclean)  # extract from uncleaned text
-    lot_number = lot_number.group(1) if lot_number else text_inside  # replace 'XX' with text_inside if not found
-
-    quad_number = re.search(r'Quadra (\w+)', text_inside_unclean)
-    quad_number = quad_number.group(1) if quad_number else text_inside  # replace 'XX' with text_inside if not found
-    area_text = num2words(area, lang='pt_BR')
+@lru_cache(maxsize=4096)
+def _area_text(cents):
+    # Lots of the same size are common, so the spelled-out area is cached by its value in cents
+    return num2words(cents / 100.0, lang='pt_BR')
+
+def parse_lot_and_quad(text):
+    """Return the first lot number and quadra found in text, or None for each one missing."""
+    lot_number = None
+    quad_number = None
+    for match in _LOT_QUAD_RE.finditer(text):
+        if match.group(1) is not None:
+            if lot_number is None:
+                lot_number = match.group(1)
+        elif quad_number is None:
+            quad_number = match.group(2)
+    return lot_number, quad_number
+
+def generate_text_from_polyline(polyline, polylines, edge_map, text_inside, text_inside_unclean):
+    snapshot = polyline['Snapshot']
+    vertices = snapshot.coords
+    area = round(snapshot.area, 2)  # convert to m²
+    perimeter = round(snapshot.length, 2)  # convert to m
+
+    lot_number, quad_number = parse_lot_and_quad(text_inside_unclean)  # extract from uncleaned text
+    lot_number = lot_number or text_inside  # replace 'XX' with text_inside if not found
+    quad_number = quad_number or text_inside  # replace 'XX' with text_inside if not found
+    area_text = _area_text(int(round(area * 100)))
 
     # Replace "LOTE Nº XX" with the nearest text inside the polyline
     header_text = template_header.render(lot_number=lot_number, quad_number=quad_number, area=area, area_text=area_text)
     
     descriptions = []
+    handle = snapshot.handle
 
+    distances = polyline['Distances']
+    azimuths = polyline['Azimuths']
+    vertex_names = polyline['VertexNames']
+    vertex_keys = quantize_points(vertices)
 
-    for i in range(len(vertices)):
+    # Zero-length edges (repeated vertices) are skipped up front
+    for i in np.flatnonzero(distances > 1e-9):
         current_vertex = vertices[i]
         next_vertex = vertices[(i+1) % len(vertices)]
 
-        tolerance = 0.001  
-
-        current_vertex_name, current_vertex_elevation = get_vertex_name(entity, selection_set, current_vertex, tolerance)
-        next_vertex_name, next_vertex_elevation = get_vertex_name(entity, selection_set, next_vertex, tolerance)
-
-        if are_floats_equal(current_vertex[0], next_vertex[0]) and are_floats_equal(current_vertex[1], next_vertex[1]):
-            continue
-
-        distance = round(math.sqrt((next_vertex[0] - current_vertex[0]) ** 2 + (next_vertex[1] - current_vertex[1]) ** 2), 2)
+        current_vertex_name, current_vertex_elevation = get_vertex_name(vertex_names, vertices, i)
+        next_vertex_name, next_vertex_elevation = get_vertex_name(vertex_names, vertices, (i+1) % len(vertices))
 
-        delta_x = next_vertex[0] - current_vertex[0]
-        delta_y = next_vertex[1] - current_vertex[1]
-        azimuth_rad = math.atan2(delta_x, delta_y)
-        azimuth_deg = math.degrees(azimuth_rad)
-        if azimuth_deg < 0:
-            azimuth_deg += 360
+        distance = round(float(distances[i]), 2)
+        azimuth_deg = float(azimuths[i])
 
         degrees = int(azimuth_deg)
         minutes = int((azimuth_deg - degrees) * 60)
         seconds = round(((azimuth_deg - degrees) * 60 - minutes) * 60, 2)
 
-        adjacent_polyline = None
-        for other_entity in selection_set:
-            if other_entity.Handle == entity.Handle:
-                continue
-            other_info = extract_coordinates(other_entity)
-            if other_info is not None and other_info['Type'] == 'Polyline':
-                other_vertices = other_info['Coordinates']
-
-                if any(are_floats_equal(v[0], current_vertex[0]) and are_floats_equal(v[1], current_vertex[1]) for v in other_vertices) and \
-                   any(are_floats_equal(v[0], next_vertex[0]) and are_floats_equal(v[1], next_vertex[1]) for v in other_vertices):
-                    adjacent_polyline = other_entity
-                    break
+        edge_key = frozenset({vertex_keys[i], vertex_keys[(i+1) % len(vertices)]})
+        adjacent_polyline = find_adjacent_polyline(edge_map, polylines, handle, edge_key, current_vertex, next_vertex)
 
         adjacent_text = "No confrontante found"
         if adjacent_polyline:
-            adjacent_text = get_text_inside_polyline(adjacent_polyline, selection_set)[0]
+            adjacent_text = adjacent_polyline['Text'][0]
 
         seconds_str = f"{seconds:.2f}"
 
+        fields = dict(current_vertex_name=current_vertex_name, current_vertex=current_vertex, current_vertex_elevation=current_vertex_elevation, adjacent_text=adjacent_text, degrees=degrees, minutes=minutes, seconds=seconds_str, distance=distance, next_vertex_name=next_vertex_name, next_vertex=next_vertex, next_vertex_elevation=next_vertex_elevation)
+
         # Render the description
         if i == 0:
-            description = template_initial.render(current_vertex_name=current_vertex_name, current_vertex=current_vertex, current_vertex_elevation=current_vertex_elevation, adjacent_text=adjacent_text, degrees=degrees, minutes=minutes, seconds=seconds_str, distance=distance, next_vertex_name=next_vertex_name, next_vertex=next_vertex, next_vertex_elevation=next_vertex_elevation)
+            description = _fmt_initial(**fields)
         else:
-            description = template_other.render(current_vertex_name=current_vertex_name, current_vertex=current_vertex, current_vertex_elevation=current_vertex_elevation, adjacent_text=adjacent_text, degrees=degrees, minutes=minutes, seconds=seconds_str, distance=distance, next_vertex_name=next_vertex_name, next_vertex=next_vertex, next_vertex_elevation=next_vertex_elevation)
+            description = _fmt_other(**fields)
 
         descriptions.append(description)
 
         # Render the table line
-        table_line = template_table.render(current_vertex_name=current_vertex_name, current_vertex=current_vertex, current_vertex_elevation=current_vertex_elevation, adjacent_text=adjacent_text, degrees=degrees, minutes=minutes, seconds=seconds_str, distance=distance, next_vertex_name=next_vertex_name, next_vertex=next_vertex, next_vertex_elevation=next_vertex_elevation)
+        table_line = _fmt_table(**fields)
         print(table_line)
-        
-        
+
     descriptions_text = '\n'.join(descriptions)
-    final_text = template_final.render()
 
     # Print old formatted text
-    print(f"{header_text}\n\n{descriptions_text}\n{final_text}\n")
+    print(f"{header_text}\n\n{descriptions_text}\n{_FINAL_TEXT}\n")
+
+# Read every COM entity once up front; the per-vertex loops only touch these indexes
+snapshots = snapshot_selection_set(selection_set)
+cogopoint_index = build_cogopoint_index(snapshots)
+polylines = build_polyline_index(snapshots)
+texts = build_text_index(snapshots)
+edge_map = build_edge_map(polylines)
+
+# Edges, vertex names and each polyline's label are computed once for all polylines;
+# neighbours reuse the label instead of searching the texts again per edge
+process_polylines(polylines, texts, cogopoint_index)
 
 # Use the function for each polyline in the selection set
-for entity in selection_set:
-    if entity.EntityName == 'AcDbPolyline':
-        text_inside, text_inside_unclean = get_text_inside_polyline(entity, selection_set)
-        generate_text_from_polyline(entity, selection_set, text_inside, text_inside_unclean)
+for polyline in polylines:
+    text_inside, text_inside_unclean = polyline['Text']
+    generate_text_from_polyline(polyline, polylines, edge_map, text_inside, text_inside_unclean)
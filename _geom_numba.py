@@ -0,0 +1,151 @@
+import math
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    # Without numba the kernels still work as plain Python, just slower
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+    prange = range
+
+@njit(cache=True)
+def distance_sq(point1, point2):
+    dx = point1[0] - point2[0]
+    dy = point1[1] - point2[1]
+    return dx * dx + dy * dy
+
+@njit(cache=True)
+def point_in_polygon(x, y, px, py):
+    """Ray-cast (x, y) against the polygon given as contiguous float64 vertex arrays."""
+    n = len(px)
+    inside = False
+    j = n - 1
+    for i in range(n):
+        p1x = px[j]
+        p1y = py[j]
+        p2x = px[i]
+        p2y = py[i]
+        j = i
+        # Explicit comparisons instead of min()/max() keep numba's type inference simple
+        if p1y < p2y:
+            min_y = p1y
+            max_y = p2y
+        else:
+            min_y = p2y
+            max_y = p1y
+        if p1x > p2x:
+            max_x = p1x
+        else:
+            max_x = p2x
+        if y > min_y and y <= max_y and x <= max_x:
+            if p1x == p2x:
+                inside = not inside
+            else:
+                xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
+                if x <= xinters:
+                    inside = not inside
+    return inside
+
+@njit(cache=True)
+def point_in_convex_polygon(x, y, px, py):
+    """Return True when (x, y) lies on the same side of every edge of a convex polygon."""
+    n = len(px)
+    sign = 0.0
+    j = n - 1
+    for i in range(n):
+        cross = (px[i] - px[j]) * (y - py[j]) - (py[i] - py[j]) * (x - px[j])
+        j = i
+        if cross != 0:
+            if sign == 0:
+                sign = cross
+            elif sign * cross < 0:
+                return False
+    return sign != 0
+
+@njit(cache=True)
+def is_convex_polygon(px, py, tolerance=1e-9):
+    """Return True when the polygon turns the same way at every corner and winds around exactly once."""
+    # Drop consecutive repeated vertices (including the closing one) so the turn at every corner is checked
+    n = len(px)
+    xs = np.empty(n)
+    ys = np.empty(n)
+    m = 0
+    for i in range(n):
+        if abs(px[i] - px[i - 1]) < tolerance and abs(py[i] - py[i - 1]) < tolerance:
+            continue
+        xs[m] = px[i]
+        ys[m] = py[i]
+        m += 1
+    if m < 3:
+        return False
+
+    sign = 0.0
+    total_turn = 0.0
+    for i in range(m):
+        j = (i + 1) % m
+        k = (i + 2) % m
+        e1x = xs[j] - xs[i]
+        e1y = ys[j] - ys[i]
+        e2x = xs[k] - xs[j]
+        e2y = ys[k] - ys[j]
+        cross = e1x * e2y - e1y * e2x
+        if cross != 0:
+            if sign == 0:
+                sign = cross
+            elif sign * cross < 0:
+                return False
+        total_turn += math.atan2(cross, e1x * e2x + e1y * e2y)
+    # A star polygon turns the same way everywhere but winds around more than once
+    return sign != 0 and abs(abs(total_turn) - 2 * math.pi) < 1e-6
+
+@njit(parallel=True, cache=True)
+def compute_all(poly_offsets, poly_x, poly_y, poly_convex, text_x, text_y):
+    """Return each vertex's outgoing edge length and azimuth, and each polyline's nearest inner text (-1 if none)."""
+    # Polyline p owns the flattened vertices poly_offsets[p]:poly_offsets[p+1]
+    n_polylines = len(poly_offsets) - 1
+    distances = np.empty(len(poly_x))
+    azimuths = np.empty(len(poly_x))
+    nearest_text = np.full(n_polylines, -1, dtype=np.int64)
+
+    for p in prange(n_polylines):
+        start = poly_offsets[p]
+        end = poly_offsets[p + 1]
+        n = end - start
+        if n == 0:
+            continue
+        px = poly_x[start:end]
+        py = poly_y[start:end]
+
+        center_x = 0.0
+        center_y = 0.0
+        for i in range(n):
+            j = (i + 1) % n
+            dx = px[j] - px[i]
+            dy = py[j] - py[i]
+            distances[start + i] = math.sqrt(dx * dx + dy * dy)
+            azimuth = math.degrees(math.atan2(dx, dy))
+            if azimuth < 0:
+                azimuth += 360
+            azimuths[start + i] = azimuth
+            center_x += px[i]
+            center_y += py[i]
+        center_x /= n
+        center_y /= n
+
+        best_distance_sq = np.inf
+        for t in range(len(text_x)):
+            if poly_convex[p]:
+                inside = point_in_convex_polygon(text_x[t], text_y[t], px, py)
+            else:
+                inside = point_in_polygon(text_x[t], text_y[t], px, py)
+            if inside:
+                text_distance_sq = distance_sq((text_x[t], text_y[t]), (center_x, center_y))
+                if text_distance_sq < best_distance_sq:
+                    best_distance_sq = text_distance_sq
+                    nearest_text[p] = t
+
+    return distances, azimuths, nearest_text
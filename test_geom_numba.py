@@ -0,0 +1,32 @@
+import math
+import numpy as np
+from _geom_numba import compute_all, is_convex_polygon, point_in_convex_polygon, point_in_polygon
+
+def _arrays(points):
+    return np.array([p[0] for p in points], dtype=np.float64), np.array([p[1] for p in points], dtype=np.float64)
+
+def test_square_with_repeated_closing_vertex_is_convex():
+    assert is_convex_polygon(*_arrays([(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)]))
+
+def test_repeated_vertex_on_concave_corner_is_not_convex():
+    px, py = _arrays([(1, 1), (1, 2), (0, 2), (0, 0), (2, 0), (2, 1), (1, 1)])
+    assert not is_convex_polygon(px, py)
+
+    poly_offsets = np.array([0, len(px)], dtype=np.int64)
+    poly_convex = np.array([is_convex_polygon(px, py)], dtype=np.bool_)
+    _, _, nearest_text = compute_all(poly_offsets, px, py, poly_convex, np.array([0.5]), np.array([1.5]))
+    assert nearest_text[0] == 0
+
+def test_pentagram_is_not_convex():
+    points = [(math.cos(math.pi / 2 + k * 4 * math.pi / 5), math.sin(math.pi / 2 + k * 4 * math.pi / 5)) for k in range(5)]
+    px, py = _arrays(points)
+    assert not is_convex_polygon(px, py)
+    assert not point_in_polygon(0.0, 0.0, px, py)
+
+def test_convex_test_matches_ray_cast_on_convex_polygon():
+    px, py = _arrays([(0, 0), (4, 0), (5, 3), (2, 5), (-1, 3)])
+    assert is_convex_polygon(px, py)
+    # Offset grid so no sample lands on an edge, where the two tests may legitimately differ
+    for x in np.linspace(-2, 6, 17) + 0.013:
+        for y in np.linspace(-1, 6, 15) + 0.017:
+            assert point_in_convex_polygon(x, y, px, py) == point_in_polygon(x, y, px, py)